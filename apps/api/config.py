@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from functools import lru_cache
+from typing import List, Optional
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
@@ -13,15 +14,22 @@ class Settings(BaseSettings):
     # Model Configuration: OpenAI
     OPENAI_API_KEY: str
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small" # text-embedding-ada-002
-    OPENAI_CHAT_MODEL: str = "gpt-4-turbo-preview"
+    OPENAI_CHAT_MODEL: str = "gpt-4o-mini"
+    OPENAI_CHAT_MAX_TOKENS: int = 500
+    OPENAI_CHAT_TEMPERATURE: float = 0.5
+    OPENAI_MAX_RETRIES: int = 5 # SDK retries 429/5xx with exponential backoff
+    OPENAI_TIMEOUT: float = 30.0 # Seconds per request
+    OPENAI_MAX_CONNECTIONS: int = 100 # Pooled HTTP connections per client
+    embedding_max_concurrency: int = 8 # embedding batch requests in flight at once
 
     # Database Configuration
-    # database_url: str
-    # postgres_user: str = 'postgres'
-    # POSTGRES_PASSWORD: str
-    # postgres_db: str = 'security'
-    # postgres_host: str = 'localhost'
-    # postgres_port: int = 5432
+    database_url: str
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_timeout: int = 30 # seconds to wait for a free connection
+    db_pool_recycle: int = 1800 # seconds, before Postgres/pgbouncer drop idle connections
+    db_query_cache_size: int = 1200 # compiled SQL statements kept per engine
+    db_pool_warm: int = 5 # connections opened at startup (capped at db_pool_size)
 
     chroma_persist_directory: str = './chroma_data'
     chroma_collection_documents: str = 'documents'
@@ -37,20 +45,48 @@ class Settings(BaseSettings):
     chunk_size: int = 1000
     chunk_overlap: int = 200
     top_k_results: int = 5
+    max_context_chars: int = 12000 # Budget for retrieved text sent to the LLM
     similarity_threshold: float = 0.7
+    hnsw_ef_search: int = 40 # HNSW candidate list size per query (recall vs. speed)
+    hnsw_iterative_scan: Optional[str] = None # e.g. "strict_order"; needs pgvector >= 0.8
+    # Search only the chunks of the N documents whose centroid is closest to the query;
+    # None searches all chunks. Enabling hnsw_iterative_scan keeps this filtered scan from
+    # returning fewer than top_k chunks
+    retrieval_top_documents: Optional[int] = None
+
+    # Embedding cache. Re-ingesting known texts skips the OpenAI call.
+    embedding_cache_enabled: bool = True
+    embedding_cache_path: str = './data/embedding_cache.sqlite3'
+    query_embedding_cache_size: int = 4096 # recent query embeddings kept in memory
 
     # API Configuration
     api_host: str = '0.0.0.0'
     api_port: int = 8000
+    api_workers: int = 1 # Worker processes; ignored when reloading (debug)
+    api_loop: str = "auto" # "auto" uses uvloop when installed
+    api_http: str = "auto" # "auto" uses httptools when installed
+    api_backlog: int = 2048 # Pending connections queued by the listening socket
+    api_limit_concurrency: Optional[int] = None # Connections/tasks before 503; None is unlimited
     cors_origins: List[str] = ['http://localhost:8501', 'http://localhost:3000'] # 8501 for Streamlit, 3000 for React
+    health_check_ttl: float = 5.0 # seconds a connection check result is reused
+
+    @property
+    def async_database_url(self) -> str:
+        return self.database_url.replace('postgresql://', 'postgresql+asyncpg://')
+
+    @property
+    def sync_database_url(self) -> str:
+        return self.database_url.replace('postgresql://', 'postgresql+psycopg2://')
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Get the application settings.
 
-    # @property
-    # def async_database_url(self) -> str:
-    #     return self.database_url.replace('postgresql://', 'postgresql+asyncpg://')
-    #
-    # @property
-    # def sync_database_url(self) -> str:
-    #     return self.database_url.replace('postgresql://', 'postgresql+psycopg2://')
+    The `.env` file and environment are parsed only once per process;
+    later calls return the cached instance. Use with `Depends(get_settings)`.
+    """
+    return Settings()
 
 # Global settings. Global instances of Settings are available in other modules.
-settings = Settings()
\ No newline at end of file
+settings = get_settings()
@@ -1,10 +1,15 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
-from typing import Generator, Optional
+from functools import lru_cache
+from typing import Dict, Generator, Optional, Tuple
 import logging
+import time
+
+import orjson
 
 import chromadb
+from chromadb.api.models.Collection import Collection
 from chromadb.config import Settings as ChromaSettings
 from pathlib import Path
 
@@ -15,7 +20,7 @@ from apps.api.models.db_models import (COLLECTION_DOCUMENTS, COLLECTION_CHUNKS)
 logger = logging.getLogger(__name__)
 
 # This is the core class, responsible for all database-related operations.
-# It follows a singleton-like pattern via the global db_manager instance
+# It follows a singleton-like pattern via the get_db_manager() accessor
 class DatabaseManager:
     """Manager class for database operations."""
     def __init__(self):
@@ -23,26 +28,36 @@ class DatabaseManager:
             settings.sync_database_url,
             echo=settings.debug,
             pool_pre_ping=True,
-            pool_size=5,
-            max_overflow=10,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_use_lifo=True, # Reuse the most recent connections so idle ones can age out
+            query_cache_size=settings.db_query_cache_size,
+            # JSONB columns are encoded/decoded with orjson
+            json_serializer=lambda obj: orjson.dumps(obj).decode(),
+            json_deserializer=orjson.loads,
         )
         self.SessionLocal = sessionmaker(
             autocommit=False,
             autoflush=False,
+            expire_on_commit=False, # Committed objects stay readable without another SELECT
             bind=self.engine,
         )
+        self._last_check: Optional[Tuple[float, bool]] = None # (monotonic time, result)
 
     def create_tables(self):
-        """Create all database tables"""
+        """
+        Enable pgvector and create all database tables.
+
+        Both run in a single transaction (Postgres DDL is transactional),
+        so a failure leaves the database untouched.
+        """
         try:
-            with self.engine.connect() as conn:
+            with self.engine.begin() as conn:
                 conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-                conn.commit()
-                logger.info("pgvector extension enabled")
-
-            # Create all tables
-            Base.metadata.create_all(bind=self.engine)
-            logger.info("Tables created successfully")
+                Base.metadata.create_all(bind=conn, checkfirst=True)
+            logger.info("pgvector extension enabled and tables created successfully")
 
         except Exception as e:
             logger.error(f"Error creating tables: {e}")
@@ -60,7 +75,7 @@ class DatabaseManager:
         Context manager for database sessions.
 
         Usage:
-            with db_manager.get_session() as session:
+            with get_db_manager().get_session() as session:
             # Use session here
             pass
         """
@@ -75,18 +90,66 @@ class DatabaseManager:
         finally:
             session.close()
 
-    def check_connection(self) -> bool:
-        """Check if the database connection is working."""
+    def check_connection(self, force: bool = False) -> bool:
+        """
+        Check if the database connection is working.
+
+        The result is reused for `settings.health_check_ttl` seconds so frequent
+        health probes don't each take a pooled connection.
+
+        Args:
+            force: Always run the probe query, ignoring the cached result
+        """
+        now = time.monotonic()
+        if not force and self._last_check is not None and now - self._last_check[0] < settings.health_check_ttl:
+            return self._last_check[1]
+
         try:
             with self.engine.connect() as conn:
                 conn.execute(text("SELECT 1")) # Attempts a simple query
-                return True
+            connected = True
         except Exception as e:
             logger.error(f"Database connection failed: {e}")
-            return False
+            connected = False
+
+        self._last_check = (now, connected)
+        return connected
+
+    def warm_pool(self, size: int) -> int:
+        """
+        Open pooled connections ahead of time so the first requests don't pay for connecting.
+
+        The connections are held open together, so each one is a new connection,
+        then all of them are returned to the pool.
+
+        Args:
+            size: Number of connections to open (capped at the pool size)
+
+        Returns:
+            Number of connections opened
+        """
+        connections = []
+        try:
+            for _ in range(min(size, settings.db_pool_size)):
+                conn = self.engine.connect()
+                connections.append(conn)
+                conn.execute(text("SELECT 1"))
+        except Exception as e:
+            logger.error(f"Error warming the connection pool: {e}")
+        finally:
+            for conn in connections:
+                conn.close()
+        return len(connections)
+
+@lru_cache(maxsize=1)
+def get_db_manager() -> DatabaseManager:
+    """
+    Get the app-wide DatabaseManager instance (singleton).
 
-# Creates a single, global instance of DatabaseManager for app-wide use (singleton)
-db_manager = DatabaseManager()
+    The engine is created on first use, so importing this module does not
+    allocate a connection pool.
+    """
+    return DatabaseManager()
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -98,7 +161,7 @@ def get_db() -> Generator[Session, None, None]:
             # Use db here
             pass
     """
-    session = db_manager.SessionLocal()
+    session = get_db_manager().SessionLocal()
     try:
         yield session # Gives the session to FastAPI routes
     finally:
@@ -108,8 +171,8 @@ class ChromaDBManager:
     """Manager class for ChromaDB operations."""
     def __init__(self):
         self._client: Optional[chromadb.Client] = None
-        self._documents_collection = None
-        self._chunks_collection = None
+        self._collections: Dict[str, Collection] = {} # collection name -> handle
+        self._last_check: Optional[Tuple[float, bool]] = None # (monotonic time, result)
         self.persist_directory = settings.chroma_persist_directory
 
     @property
@@ -141,11 +204,16 @@ class ChromaDBManager:
         Returns:
             ChromaDB collection object
         """
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            return collection
+
         try:
             collection = self.client.get_or_create_collection(
                 name=collection_name,
                 metadata=metadata or {}
             )
+            self._collections[collection_name] = collection
             logger.debug(f"Collection '{collection_name}' ready")
             return collection
         except Exception as e:
@@ -155,22 +223,18 @@ class ChromaDBManager:
     @property
     def documents_collection(self):
         """Get documents collection."""
-        if self._documents_collection is None:
-            self._documents_collection = self.get_or_create_collection(
-                COLLECTION_DOCUMENTS,
-                metadata={"description": "Document storage with full content"}
-            )
-        return self._documents_collection
+        return self.get_or_create_collection(
+            COLLECTION_DOCUMENTS,
+            metadata={"description": "Document storage with full content"}
+        )
 
     @property
     def chunks_collection(self):
         """Get chunks collection."""
-        if self._chunks_collection is None:
-            self._chunks_collection = self.get_or_create_collection(
-                COLLECTION_CHUNKS,
-                metadata={"description": "Document chunks with embeddings for retrieval"}
-            )
-        return self._chunks_collection
+        return self.get_or_create_collection(
+            COLLECTION_CHUNKS,
+            metadata={"description": "Document chunks with embeddings for retrieval"}
+        )
 
     def create_collections(self):
         """Initialize all required collections."""
@@ -194,11 +258,8 @@ class ChromaDBManager:
             self.client.delete_collection(name=collection_name)
             logger.warning(f"Collection '{collection_name}' deleted")
 
-            # Reset cached collection references
-            if collection_name == COLLECTION_DOCUMENTS:
-                self._documents_collection = None
-            elif collection_name == COLLECTION_CHUNKS:
-                self._chunks_collection = None
+            # Reset cached collection reference
+            self._collections.pop(collection_name, None)
 
         except Exception as e:
             logger.error(f"Error deleting collection '{collection_name}': {e}")
@@ -208,21 +269,34 @@ class ChromaDBManager:
         """Reset all collections (use with caution!)."""
         try:
             self.client.reset()
-            self._documents_collection = None
-            self._chunks_collection = None
+            self._collections.clear()
             logger.warning("ChromaDB reset - all collections deleted")
         except Exception as e:
             logger.error(f"Error resetting ChromaDB: {e}")
             raise
 
-    def check_connection(self) -> bool:
-        """Check if ChromaDB is working."""
+    def check_connection(self, force: bool = False) -> bool:
+        """
+        Check if ChromaDB is working.
+
+        The result is reused for `settings.health_check_ttl` seconds.
+
+        Args:
+            force: Always send the heartbeat, ignoring the cached result
+        """
+        now = time.monotonic()
+        if not force and self._last_check is not None and now - self._last_check[0] < settings.health_check_ttl:
+            return self._last_check[1]
+
         try:
             _ = self.client.heartbeat()
-            return True
+            connected = True
         except Exception as e:
             logger.error(f"ChromaDB connection check failed: {e}")
-            return False
+            connected = False
+
+        self._last_check = (now, connected)
+        return connected
 
     def get_collection_stats(self, collection_name: str) -> dict:
         """
@@ -251,12 +325,15 @@ class ChromaDBManager:
                 "error": str(e)
             }
 
-chroma_manager = ChromaDBManager()
+@lru_cache(maxsize=1)
+def get_chroma_manager() -> ChromaDBManager:
+    """Get the app-wide ChromaDBManager instance (singleton)."""
+    return ChromaDBManager()
 
 def get_chroma_client() -> chromadb.Client:
     """Get ChromaDB client instance."""
-    return chroma_manager.client
+    return get_chroma_manager().client
 
 def get_chunks_collection():
     """Get chunks collection for dependency injection."""
-    return chroma_manager.chunks_collection
\ No newline at end of file
+    return get_chroma_manager().chunks_collection
@@ -1,4 +1,5 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+import io
 import logging
 from pathlib import Path
 
@@ -12,6 +13,13 @@ logger = logging.getLogger(__name__)
 
 class DocumentProcessor:
     """Service for processing and chunking documents."""
+
+    # Loader factory for each supported file extension
+    _LOADERS = {
+        ".pdf": PyPDFLoader,
+        ".txt": lambda file_path: TextLoader(file_path, encoding="utf-8"),
+    }
+
     def __init__(self):
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=settings.chunk_size,
@@ -20,6 +28,26 @@ class DocumentProcessor:
             separators=["\n\n", "\n", ". ", " ", ""],
         )
 
+    def _get_loader(self, file_path: str, file_extension: Optional[str] = None):
+        """
+        Create the LangChain loader for a file based on its extension.
+
+        Args:
+            file_path: Path to the document file
+            file_extension: Lowercase extension of the file, if already known
+
+        Raises:
+            ValueError: If the file type is not supported
+        """
+        if file_extension is None:
+            file_extension = Path(file_path).suffix.lower()
+
+        loader = self._LOADERS.get(file_extension)
+        if loader is None:
+            raise ValueError(f"Unsupported file type '{file_extension}'")
+
+        return loader(file_path)
+
     def load_document(self, file_path: str) -> List[LangChainDocument]:
         """
         Load a document from the file.
@@ -34,22 +62,50 @@ class DocumentProcessor:
             ValueError: If the file type is not supported
         """
         try:
-            file_extension = Path(file_path).suffix.lower()
-
-            if file_extension == ".pdf":
-                loader = PyPDFLoader(file_path)
-            elif file_extension == ".txt":
-                loader = TextLoader(file_path, encoding="utf-8")
-            else:
-                raise ValueError(f"Unsupported file type '{file_extension}'")
-
-            documents = loader.load()
+            documents = self._get_loader(file_path).load()
             logger.info(f"Loaded document from {file_path}: {len(documents)} pages/sections")
             return documents
         except Exception as e:
             logger.error(f"Error loading document from {file_path}: {e}")
             raise
 
+    def iter_document(self, file_path: str, file_extension: Optional[str] = None) -> Iterator[LangChainDocument]:
+        """
+        Lazily load a document from the file, one page/section at a time.
+
+        Args:
+            file_path: Path to the document file
+            file_extension: Lowercase extension of the file, if already known
+
+        Returns:
+            Iterator of LangChain Document objects
+
+        Raises:
+            ValueError: If the file type is not supported
+        """
+        return self._get_loader(file_path, file_extension).lazy_load()
+
+    @staticmethod
+    def _format_chunks(chunks: List[LangChainDocument], start_index: int = 0) -> List[Dict[str, Any]]:
+        """
+        Convert split LangChain documents into chunk dictionaries.
+
+        Args:
+            chunks: Split LangChain Document objects
+            start_index: Index of the first chunk within the whole file
+
+        Returns:
+            List of dictionaries containing chunk text and metadata
+        """
+        formatted_chunks = []
+        for idx, chunk in enumerate(chunks, start_index):
+            text = chunk.page_content
+            metadata = chunk.metadata.copy()
+            metadata["chunk_index"] = idx
+            metadata["chunk_size"] = len(text)
+            formatted_chunks.append({"text": text, "metadata": metadata})
+        return formatted_chunks
+
     def chunk_documents(self, documents: List[LangChainDocument]) -> List[Dict[str, Any]]:
         """
         Split documents into chunks.
@@ -63,18 +119,7 @@ class DocumentProcessor:
         try:
             # Split documents into chunks
             chunks = self.text_splitter.split_documents(documents)
-
-            formatted_chunks = []
-            for idx, chunk in enumerate(chunks):
-                formatted_chunk = {
-                    "text": chunk.page_content,
-                    "metadata": {
-                        **chunk.metadata,
-                        "chunk_index": idx,
-                        "chunk_size": len(chunk.page_content)
-                    }
-                }
-                formatted_chunks.append(formatted_chunk)
+            formatted_chunks = self._format_chunks(chunks)
 
             logger.info(f"Created {len(formatted_chunks)} chunks from {len(documents)} documents")
             return formatted_chunks
@@ -86,6 +131,9 @@ class DocumentProcessor:
         """
         Process a file: load and chunk it.
 
+        Pages are loaded and split one at a time, so only the current page
+        is held as a LangChain Document.
+
         Args:
             file_path: Path to the file to process
 
@@ -93,9 +141,18 @@ class DocumentProcessor:
             Tuple of (full_content, chunks)
         """
         try:
-            documents = self.load_document(file_path) # Load document
-            full_content = "\n\n".join([doc.page_content for doc in documents]) # Extract full content
-            chunks = self.chunk_documents(documents) # Create chunks
+            file_extension = Path(file_path).suffix.lower()
+            content_buffer = io.StringIO()
+            chunks = []
+            pages = self.iter_document(file_path, file_extension)
+            for page_number, page in enumerate(pages): # Load document lazily
+                if page_number:
+                    content_buffer.write("\n\n")
+                content_buffer.write(page.page_content)
+                page_chunks = self.text_splitter.split_documents([page]) # Create chunks
+                chunks.extend(self._format_chunks(page_chunks, start_index=len(chunks)))
+
+            full_content = content_buffer.getvalue() # Extract full content
             logger.info(f"Processed file {file_path}: {len(full_content)} chars, {len(chunks)} chunks")
             return full_content, chunks
         except Exception as e:
@@ -128,4 +185,4 @@ class DocumentProcessor:
             logger.error(f"Error extracting metadata from {file_path}: {e}")
             raise
 
-document_processor = DocumentProcessor() # Global document processor instance
\ No newline at end of file
+document_processor = DocumentProcessor() # Global document processor instance
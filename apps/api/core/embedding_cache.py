@@ -0,0 +1,83 @@
+from typing import Dict, List
+from pathlib import Path
+import hashlib
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_MAX_KEYS_PER_QUERY = 500
+
+class EmbeddingCache:
+    """Persistent on-disk cache of embeddings, keyed by (model, text) hash."""
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        logger.info(f"Embedding cache initialized at: {path}")
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """
+        Build the cache key for a text embedded with a given model.
+
+        Args:
+            model: Embedding model name
+            text: Cleaned text that is sent to the API
+
+        Returns:
+            Hex digest identifying the (model, text) pair
+        """
+        return hashlib.blake2b(f"{model}\0{text}".encode("utf-8"), digest_size=32).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """
+        Look up several cached embeddings at once.
+
+        Args:
+            keys: Cache keys built with make_key
+
+        Returns:
+            Dictionary of the keys found and their stored bytes
+        """
+        found = {}
+        try:
+            with self._lock:
+                for i in range(0, len(keys), _MAX_KEYS_PER_QUERY):
+                    batch = keys[i:i + _MAX_KEYS_PER_QUERY]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, value FROM embeddings WHERE key IN ({placeholders})", batch
+                    )
+                    found.update(rows)
+        except sqlite3.Error as e:
+            # A broken cache must never fail an ingest; fall back to the API
+            logger.error(f"Error reading embedding cache: {e}")
+        return found
+
+    def set_many(self, items: Dict[str, bytes]) -> None:
+        """
+        Store several embeddings at once.
+
+        Args:
+            items: Dictionary of cache keys and embedding bytes
+        """
+        if not items:
+            return
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, value) VALUES (?, ?)", items.items()
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing embedding cache: {e}")
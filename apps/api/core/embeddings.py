@@ -1,43 +1,123 @@
-from typing import List
-from openai import OpenAI
+from typing import Dict, List, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+import httpx
 import logging
 import numpy as np
 
 from apps.api.config import settings
+from apps.api.core.embedding_cache import EmbeddingCache
 
 logger = logging.getLogger(__name__)
 
+# Shared pool for concurrent embedding requests, so threads are not created per call
+_embedding_executor = ThreadPoolExecutor(
+    max_workers=settings.embedding_max_concurrency,
+    thread_name_prefix="embedding"
+)
+
+# Longer queries are embedded directly instead of being kept in the query cache
+_MAX_CACHED_QUERY_CHARS = 8192
+
+# Embeddings are stored as float16: half the bytes of float32 with negligible
+# cosine error for text-embedding-3 models. Similarity math runs in float32.
+EMBEDDING_STORAGE_DTYPE = np.float16
+
+def quantize_embedding(embedding) -> bytes:
+    """
+    Quantize an embedding vector to compact float16 bytes for storage.
+
+    Args:
+        embedding: Embedding vector (list of floats or numpy array)
+
+    Returns:
+        Raw float16 bytes of the vector
+    """
+    return np.asarray(embedding, dtype=EMBEDDING_STORAGE_DTYPE).tobytes()
+
+def dequantize_embedding(data: bytes) -> np.ndarray:
+    """
+    Restore an embedding vector stored with quantize_embedding.
+
+    Args:
+        data: Raw float16 bytes of the vector
+
+    Returns:
+        float32 numpy array
+    """
+    return np.frombuffer(data, dtype=EMBEDDING_STORAGE_DTYPE).astype(np.float32)
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Scale embedding vectors to unit length.
+
+    With unit vectors, inner product equals cosine similarity, so pgvector's
+    cheaper `<#>` operator can be used for ranking. Zero vectors are left as zeros.
+
+    Args:
+        embeddings: Vector of shape (dimension,) or matrix of shape (N, dimension)
+
+    Returns:
+        float32 array of the same shape with unit-length rows
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+
 class EmbeddingService:
     """Service for generating embeddings using OpenAI API."""
 
+    # Line breaks are replaced with spaces for better embedding quality
+    _CLEAN_TABLE = str.maketrans({"\n": " ", "\r": " "})
+
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        # One pooled, keep-alive HTTP client per SDK client, shared with the RAG pipeline
+        limits = httpx.Limits(max_connections=settings.OPENAI_MAX_CONNECTIONS)
+        self.client = OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            timeout=settings.OPENAI_TIMEOUT,
+            http_client=DefaultHttpxClient(limits=limits)
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            timeout=settings.OPENAI_TIMEOUT,
+            http_client=DefaultAsyncHttpxClient(limits=limits)
+        )
         self.model = settings.OPENAI_EMBEDDING_MODEL
         self.dimension = 1536 # text-embedding-3-small dimension
+        self.cache = EmbeddingCache(settings.embedding_cache_path) if settings.embedding_cache_enabled else None
+        self._cached_query_embedding = lru_cache(maxsize=settings.query_embedding_cache_size)(self._embed_query)
 
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text.
         Args:
             text: The text to generate embedding for
 
         Returns:
-            List of floats representing the embedding vector
+            float32 numpy array representing the embedding vector
         """
         try:
-            # Replace newlines with spaces for better embedding quality
-            text = text.replace("\n", " ").strip()
+            text = text.translate(self._CLEAN_TABLE).strip()
 
             if not text:
                 logger.warning("Empty text provided for embedding.")
-                return [0.0] * self.dimension
+                return np.zeros(self.dimension, dtype=np.float32)
+
+            cached = np.empty((1, self.dimension), dtype=np.float32)
+            if not self._lookup_cached([text], cached):
+                return cached[0]
 
             response = self.client.embeddings.create(
                 input=text,
                 model=self.model
             )
 
-            embedding = response.data[0].embedding
+            embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+            self._store_cached([text], [embedding])
             logger.debug(f"Generated embedding for text of length: {len(text)}")
 
             return embedding
@@ -45,40 +125,174 @@ class EmbeddingService:
             logger.error(f"Error generating embedding: {e}")
             raise
 
-    def generate_embedding_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
+    def generate_query_embedding(self, query: str) -> np.ndarray:
+        """
+        Generate embedding for a search query, reusing recent results.
+
+        Queries are keyed by their whitespace-collapsed text, so a repeated
+        question skips the API round-trip entirely.
+
+        Args:
+            query: The query text
+
+        Returns:
+            Read-only float32 numpy array representing the embedding vector
+        """
+        key = " ".join(query.split())
+        if len(key) > _MAX_CACHED_QUERY_CHARS:
+            return self.generate_embedding(key)
+        return self._cached_query_embedding(key)
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a normalized query for the in-memory query cache."""
+        embedding = self.generate_embedding(query)
+        embedding.setflags(write=False) # The cached array is shared between callers
+        return embedding
+
+    @classmethod
+    def _clean_and_deduplicate(cls, texts: List[str]) -> Tuple[List[str], List[int]]:
+        """
+        Clean texts and collapse identical ones.
+
+        Args:
+            texts: List of raw texts
+
+        Returns:
+            Tuple of (unique non-empty cleaned texts, index into the unique list
+            for each input text, or -1 for texts that are empty after cleaning)
+        """
+        clean_table = cls._CLEAN_TABLE
+        positions: Dict[str, int] = {}
+        order = []
+        for text in texts:
+            cleaned = text.translate(clean_table).strip()
+            order.append(positions.setdefault(cleaned, len(positions)) if cleaned else -1)
+        return list(positions), order
+
+    def _scatter_embeddings(self, unique_embeddings: np.ndarray, order: List[int]) -> np.ndarray:
+        """
+        Map unique embeddings back to the input positions given by _clean_and_deduplicate.
+
+        Empty texts get a zero vector.
+        """
+        if len(order) == len(unique_embeddings) and -1 not in order:
+            # No duplicates or empty texts: rows are already in input order
+            return unique_embeddings
+
+        positions = np.asarray(order, dtype=np.intp)
+        present = positions >= 0
+        if not present.all():
+            logger.warning(f"{len(order) - int(present.sum())} empty texts provided for embedding.")
+
+        embeddings = np.zeros((len(order), self.dimension), dtype=np.float32)
+        embeddings[present] = unique_embeddings[positions[present]]
+        return embeddings
+
+    def _lookup_cached(self, texts: List[str], out: np.ndarray) -> List[int]:
+        """
+        Look up cleaned texts in the embedding cache.
+
+        Args:
+            texts: List of cleaned texts
+            out: Matrix of shape (len(texts), dimension); rows of cached texts are filled in
+
+        Returns:
+            Indexes of texts not in the cache
+        """
+        if self.cache is None:
+            return list(range(len(texts)))
+
+        model = self.model
+        keys = [EmbeddingCache.make_key(model, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        missing = []
+        for idx, key in enumerate(keys):
+            data = found.get(key)
+            if data is None:
+                missing.append(idx)
+            else:
+                out[idx] = dequantize_embedding(data)
+        return missing
+
+    def _store_cached(self, texts: List[str], embeddings) -> None:
+        """
+        Store freshly generated embeddings in the embedding cache.
+
+        Args:
+            texts: List of cleaned texts
+            embeddings: Embedding vector for each text
+        """
+        if self.cache is None:
+            return
+        model = self.model
+        self.cache.set_many({
+            EmbeddingCache.make_key(model, text): quantize_embedding(embedding)
+            for text, embedding in zip(texts, embeddings)
+        })
+
+    @staticmethod
+    def _ordered_embeddings(response) -> List[List[float]]:
+        """Get the embeddings of a batch response in input order (the API may reorder them)."""
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    @classmethod
+    def _embed_batch(cls, create, model: str, batch: List[str]) -> List[List[float]]:
+        """Generate embeddings for one batch of cleaned texts with a single API request."""
+        response = create(
+            input=batch,
+            model=model
+        )
+        return cls._ordered_embeddings(response)
+
+    def generate_embedding_batch(self, texts: List[str], batch_size: int = 100) -> np.ndarray:
         """
         Generate embeddings for multiple texts in batches.
 
+        Batches are sent concurrently on a shared thread pool. Identical texts
+        (page headers, footers, TOC entries) are sent to the API only once.
+
         Args:
             texts: List of texts to generate embeddings for
             batch_size: Number of texts to process in each batch
 
         Returns:
-            List of embedding vectors
+            float32 matrix of shape (len(texts), dimension), one embedding per row
         """
         try:
-            all_embeddings = []
+            unique_texts, order = self._clean_and_deduplicate(texts)
+            unique_embeddings = np.empty((len(unique_texts), self.dimension), dtype=np.float32)
+            missing = self._lookup_cached(unique_texts, unique_embeddings)
+            missing_texts = [unique_texts[idx] for idx in missing]
 
             # This pattern is commonly used for batch processing -
             # dividing a large list into smaller chunks to process incrementally.
             # Process texts in batches of batch_size
-            for i in range(0, len(texts), batch_size): # 0 (start), len(texts) (end), batch_size step (increment)
-                batch = texts[i:i + batch_size]
-                # Clean texts
-                cleaned_batch = [text.replace("\n", " ").strip() for text in batch]
+            batch_starts = range(0, len(missing_texts), batch_size) # 0 (start), len(texts) (end), batch_size step (increment)
+            batches = [missing_texts[i:i + batch_size] for i in batch_starts]
+            # Bind hot attributes once, outside the batch loop
+            embed_batch = partial(self._embed_batch, self.client.embeddings.create, self.model)
 
-                response = self.client.embeddings.create(
-                    input=cleaned_batch,
-                    model=self.model
-                )
+            # map() yields results in submission order, so batches stay aligned with texts
+            if len(batches) > 1:
+                batch_results = _embedding_executor.map(embed_batch, batches)
+            else:
+                batch_results = map(embed_batch, batches)
 
-                batch_embeddings = [item.embedding for item in response.data]
-                all_embeddings.extend(batch_embeddings)
+            for i, batch, batch_embeddings in zip(batch_starts, batches, batch_results):
+                batch_positions = missing[i:i + batch_size]
+                unique_embeddings[batch_positions] = batch_embeddings
+                self._store_cached(batch, unique_embeddings[batch_positions])
 
                 logger.info(f"Generated embeddings for batch {i // batch_size + 1} "
                             f"({len(batch)} texts)")
 
-            return all_embeddings
+            if len(unique_texts) < len(texts):
+                logger.info(f"Skipped {len(texts) - len(unique_texts)} duplicate texts")
+            if len(missing_texts) < len(unique_texts):
+                logger.info(f"Loaded {len(unique_texts) - len(missing_texts)} embeddings from cache")
+
+            return self._scatter_embeddings(unique_embeddings, order)
         except Exception as e:
             logger.error(f"Error generating batch embeddings: {e}")
             raise
@@ -95,20 +309,39 @@ class EmbeddingService:
             Cosine similarity score (0 to 1)
         """
         try:
-            arr1 = np.array(vec1)
-            arr2 = np.array(vec2)
+            similarity = self.cosine_similarity_batch(vec1, np.asarray(vec2, dtype=np.float32)[np.newaxis, :])
+            return float(similarity[0])
+        except Exception as e:
+            logger.error(f"Error calculating cosine similarity: {e}")
+            raise
 
-            dot_product = np.dot(arr1, arr2)
-            norm1 = np.linalg.norm(arr1)
-            norm2 = np.linalg.norm(arr2)
+    def cosine_similarity_batch(self, query: np.ndarray, matrix: np.ndarray,
+                                matrix_norms: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Calculate cosine similarity between a query vector and every row of a matrix.
+
+        Args:
+            query: Query embedding vector, shape (dimension,)
+            matrix: Embedding matrix, shape (N, dimension)
+            matrix_norms: Precomputed row norms of the matrix, shape (N,).
+                Computed here if not provided.
+
+        Returns:
+            Array of N cosine similarity scores
+        """
+        try:
+            query = np.asarray(query, dtype=np.float32)
+            matrix = np.asarray(matrix, dtype=np.float32)
+            if matrix_norms is None:
+                matrix_norms = np.linalg.norm(matrix, axis=1)
 
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
+            scores = matrix @ query
+            denominator = matrix_norms * np.linalg.norm(query)
 
-            similarity = dot_product / (norm1 * norm2)
-            return float(similarity)
+            # Zero vectors have no direction, score them as 0
+            return np.divide(scores, denominator, out=np.zeros_like(scores), where=denominator != 0)
         except Exception as e:
-            logger.error(f"Error calculating cosine similarity: {e}")
+            logger.error(f"Error calculating batch cosine similarity: {e}")
             raise
 
 embedding_service = EmbeddingService()
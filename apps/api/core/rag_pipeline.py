@@ -1,31 +1,103 @@
-from typing import List, Tuple
+from typing import AsyncIterator, List
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from openai import OpenAI
+from sqlalchemy import text, insert, select, update, bindparam
+from pgvector.sqlalchemy import HALFVEC
+import asyncio
+import io
 import logging
-import json
+import orjson
 import time
 
-from apps.api.models.db_models import Document, DocumentChunk, QueryLog
+from apps.api.models.db_models import (Document, DocumentChunk, QueryLog, DOCUMENT_STATUS_PROCESSING,
+                                       DOCUMENT_STATUS_READY, DOCUMENT_STATUS_FAILED)
 from apps.api.models.schemas import RetrievedChunk, QueryResponse
-from apps.api.core.embeddings import embedding_service
+from apps.api.core.embeddings import embedding_service, normalize_embeddings
 from apps.api.core.document_processor import document_processor
+from apps.api.core.database import get_db_manager
 from apps.api.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Statements are built once at import and reused, so they hit the engine's compiled cache.
+
+# pgvector similarity search. Stored and query vectors are unit length, so the
+# negative inner product (<#>) ranks like cosine distance without normalizing per row.
+# The MATERIALIZED CTE keeps the HNSW scan a plain ORDER BY ... LIMIT; the threshold
+# is applied to those top_k rows afterwards instead of filtering the index scan.
+_RETRIEVAL_SQL_TEMPLATE = """
+    WITH {document_cte}nearest AS MATERIALIZED (
+        SELECT
+            dc.id,
+            dc.document_id,
+            dc.chunk_text,
+            dc.chunk_index,
+            dc.embedding <#> :query_embedding AS distance
+        FROM document_chunks dc
+        {document_filter}
+        ORDER BY distance
+        LIMIT :top_k
+    )
+    SELECT
+        n.id,
+        n.document_id,
+        n.chunk_text,
+        n.chunk_index,
+        d.filename,
+        -n.distance AS similarity
+    FROM nearest n
+    JOIN documents d ON n.document_id = d.id
+    WHERE n.distance <= :max_distance
+    ORDER BY n.distance
+"""
+
+_RETRIEVAL_SQL = text(
+    _RETRIEVAL_SQL_TEMPLATE.format(document_cte="", document_filter="")
+).bindparams(bindparam("query_embedding", type_=HALFVEC(1536)))
+
+# Two-stage variant: rank documents by their centroid (one inner product per document),
+# then search chunks of the top documents only
+_RETRIEVAL_BY_DOCUMENT_SQL = text(_RETRIEVAL_SQL_TEMPLATE.format(
+    document_cte="""top_documents AS MATERIALIZED (
+        SELECT d.id
+        FROM documents d
+        WHERE d.centroid IS NOT NULL
+        ORDER BY d.centroid <#> :query_embedding
+        LIMIT :top_documents
+    ),
+    """,
+    document_filter="WHERE dc.document_id IN (SELECT id FROM top_documents)"
+)).bindparams(bindparam("query_embedding", type_=HALFVEC(1536)))
+
+# Transaction-local HNSW tuning, applied in a single round trip
+_HNSW_PARAMS = {"ef_search": str(settings.hnsw_ef_search)}
+if settings.hnsw_iterative_scan:
+    _HNSW_PARAMS["iterative_scan"] = settings.hnsw_iterative_scan
+_SET_HNSW_SQL = text("SELECT " + ", ".join(
+    f"set_config('hnsw.{name}', :{name}, true)" for name in _HNSW_PARAMS
+))
+
+# Kept byte-identical across requests so the prompt prefix is cacheable
+_SYSTEM_PROMPT = (
+    "You are a helpful assistant that answers questions based on the provided context. "
+    "Use only the information from the context to answer the question. "
+    "If the context doesn't contain enough information, say so. "
+    "Always cite which source document your answer comes from."
+)
+
 class RAGPipeline:
     """RAG (Retrieval-Augmented Generation) pipeline for document Q&A."""
     def __init__(self):
         self.embedding_service = embedding_service
         self.document_processor = document_processor
+        # Reuse the embedding service's async client and its connection pool
+        self.llm_client = embedding_service.async_client
         self.top_k = settings.top_k_results
         self.similarity_threshold = settings.similarity_threshold
 
-    def ingest_document(self, file_path: str, filename: str,
-                        file_type: str, db: Session) -> Tuple[int, int]:
+    def create_document(self, file_path: str, filename: str,
+                        file_type: str, db: Session) -> int:
         """
-        Ingest a document: process, chunk, embed, and store in database.
+        Create the record of an uploaded document, marked as processing until it is ingested.
 
         Args:
             file_path: Path to the document file
@@ -34,44 +106,106 @@ class RAGPipeline:
             db: Database session
 
         Returns:
-            Tuple of (document_id, number_of_chunks)
+            ID of the new document
         """
         try:
-            logger.info(f"Starting ingestion of document {filename}...")
-            #Process document
-            full_content, chunks = self.document_processor.process_file(file_path)
-            # Create the document record
             document = Document(
                 filename=filename,
                 file_path=file_path,
                 file_type=file_type,
-                content=full_content,
-                extra_metadata=json.dumps({"chunk_count": len(chunks)})
+                content="", # Filled in by ingest_document
+                status=DOCUMENT_STATUS_PROCESSING
             )
             db.add(document)
-            db.flush() # Get document ID without committing
+            db.commit()
+            return document.id
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error creating document {filename}: {e}")
+            raise
+
+    def ingest_document(self, document_id: int, db: Session) -> int:
+        """
+        Ingest a document: process, chunk, embed, and store in database.
+
+        The document is marked ready on success and failed if ingestion raises.
+        No transaction is held open while the file is processed and embedded;
+        the results are written in one short transaction at the end.
+
+        Args:
+            document_id: ID of a document created with create_document
+            db: Database session
+
+        Returns:
+            Number of chunks created
+        """
+        document = db.execute(
+            select(Document.filename, Document.file_path).where(Document.id == document_id)
+        ).first()
+        # End the read transaction so no connection sits idle while embedding
+        db.commit()
+        if document is None:
+            raise ValueError(f"Document with ID {document_id} not found")
+        filename = document.filename
+        try:
+            logger.info(f"Starting ingestion of document {filename}...")
+            #Process document
+            full_content, chunks = self.document_processor.process_file(document.file_path)
             # Generate embeddings for chunks
             chunk_texts = [chunk["text"] for chunk in chunks]
-            embeddings = self.embedding_service.generate_embedding_batch(chunk_texts)
-
-            for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                chunk_record = DocumentChunk(
-                    document_id=document.id,
-                    chunk_text=chunk["text"],
-                    chunk_index=idx,
-                    embedding=embedding,
-                    extra_metadata=json.dumps(chunk["metadata"])
+            embeddings = normalize_embeddings(self.embedding_service.generate_embedding_batch(chunk_texts))
+            # The mean of unit vectors, renormalized, ranks documents by mean chunk similarity
+            centroid = normalize_embeddings(embeddings.mean(axis=0)) if len(embeddings) else None
+
+            # Chunks are inserted with one executemany instead of one ORM object per chunk
+            chunk_rows = [
+                {
+                    "document_id": document_id,
+                    "chunk_text": chunk["text"],
+                    "chunk_index": idx,
+                    "embedding": embedding,
+                    "extra_metadata": chunk["metadata"]
+                }
+                for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+            ]
+
+            # Complete the document record and store its chunks in one short transaction
+            db.execute(
+                update(Document).where(Document.id == document_id).values(
+                    content=full_content,
+                    extra_metadata={"chunk_count": len(chunks)},
+                    centroid=centroid,
+                    status=DOCUMENT_STATUS_READY
                 )
-                db.add(chunk_record)
+            )
+            if chunk_rows:
+                db.execute(insert(DocumentChunk), chunk_rows)
             db.commit()
             logger.info(f"Successfully ingested document {filename}: "
-                        f"ID={document.id}, chunks={len(chunks)}")
-            return document.id, len(chunks)
+                        f"ID={document_id}, chunks={len(chunks)}")
+            return len(chunks)
         except Exception as e:
             db.rollback()
             logger.error(f"Error ingesting document {filename}: {e}")
+            db.execute(
+                update(Document).where(Document.id == document_id).values(status=DOCUMENT_STATUS_FAILED)
+            )
+            db.commit()
             raise
 
+    def ingest_document_in_background(self, document_id: int) -> None:
+        """
+        Ingest a document outside the request that uploaded it.
+
+        Runs after the response is sent, so it uses a database session of its own.
+        Failures are logged and recorded in the document's status.
+        """
+        try:
+            with get_db_manager().get_session() as db:
+                self.ingest_document(document_id, db)
+        except Exception as e:
+            logger.error(f"Background ingestion of document {document_id} failed: {e}")
+
     def retrieval_relevant_chunks(self, query:str, db: Session, top_k: int = None,
                                   similarity_threshold: float = None) -> List[RetrievedChunk]:
         """
@@ -93,33 +227,21 @@ class RAGPipeline:
 
             logger.info(f"Retrieving relevant chunks for query: '{query[:50]}...'")
             #Generate query embedding
-            query_embedding = self.embedding_service.generate_embedding(query)
-
-            # Use pgvector for similarity search
-            # Note: Using cosine distance (1 - cosine similarity)
-            sql_query = text("""
-                SELECT
-                    dc.id,
-                    dc.document_id,
-                    dc.chunk_text,
-                    dc.chunk_index,
-                    d.filename,
-                    1 - (dc.embedding <=> :query_embedding) AS similarity
-                FROM document_chunk dc
-                JOIN documents d ON dc.document_id = d.id
-                WHERE 1 - (dc.embedding <=> :query_embedding) >= :threshold
-                ORDER BY dc.embedding <=> :query_embedding
-                LIMIT :top_k
-            """)
-
-            result = db.execute(
-                sql_query,
-                {
-                    "query_embedding": str(query_embedding),
-                    "threshold": similarity_threshold,
-                    "top_k": top_k
-                }
-            )
+            query_embedding = normalize_embeddings(self.embedding_service.generate_query_embedding(query))
+
+            # Tune the HNSW search for this transaction only
+            db.execute(_SET_HNSW_SQL, _HNSW_PARAMS)
+
+            params = {
+                "query_embedding": query_embedding, # numpy array, serialized by pgvector
+                "max_distance": -similarity_threshold, # <#> is the negative inner product
+                "top_k": top_k
+            }
+            if settings.retrieval_top_documents:
+                params["top_documents"] = settings.retrieval_top_documents
+                result = db.execute(_RETRIEVAL_BY_DOCUMENT_SQL, params)
+            else:
+                result = db.execute(_RETRIEVAL_SQL, params)
 
             retrieved_chunks = []
             for row in result:
@@ -132,6 +254,8 @@ class RAGPipeline:
                     chunk_index=row.chunk_index
                 )
                 retrieved_chunks.append(chunk)
+            # End the read transaction so the pooled connection is not held during the LLM call
+            db.commit()
             logger.info(f"Retrieved {len(retrieved_chunks)} relevant chunks")
 
             return retrieved_chunks
@@ -139,12 +263,38 @@ class RAGPipeline:
             logger.error(f"Error retrieving relevant chunks for query: {e}")
             raise
 
-    def generate_answer(self, query: str, retrieved_chunks: List[RetrievedChunk]):
+    _NO_CONTEXT_ANSWER = ("I couldn't find any relevant information in the knowledge base "
+                          "to answer your question. Please try rephrasing or ask about a different topic.")
+
+    @staticmethod
+    def _build_messages(query: str, retrieved_chunks: List[RetrievedChunk]) -> List[dict]:
         """
-        Generate an answer based on retrieved chunks.
+        Build the chat messages for the retrieved context.
+
+        The system prompt comes first and never changes, so every request shares the
+        same prefix and benefits from OpenAI's automatic prompt caching.
+        """
+        # Build context from retrieved chunks, splitting the character budget between them
+        # so the LLM input (and thus its latency) stays bounded as top_k grows
+        cap = settings.max_context_chars // max(len(retrieved_chunks), 1)
+        buf = io.StringIO()
+        for i, chunk in enumerate(retrieved_chunks):
+            if i:
+                buf.write("\n\n")
+            buf.write(f"Source: {chunk.filename} (Chunk {chunk.chunk_index})\n")
+            buf.write(chunk.chunk_text[:cap])
+        context = buf.getvalue()
 
-        For now, this is a simple context-based response.
-        This will be enhanced with LLM integration later.
+        return [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": f"Context:\n{context}"},
+            {"role": "user", "content": f"Question: {query}\n"
+                                        "Please provide a clear and detailed answer based on the context."}
+        ]
+
+    async def generate_answer(self, query: str, retrieved_chunks: List[RetrievedChunk]) -> str:
+        """
+        Generate an answer based on retrieved chunks.
 
         Args:
             query: User query
@@ -155,38 +305,14 @@ class RAGPipeline:
         """
         try:
             if not retrieved_chunks:
-                return ("I couldn't find any relevant information in the knowledge base "
-                    "to answer your question. Please try rephrasing or ask about a different topic.")
-
-            # Build context from retrieved chunks
-            context = "\n\n".join([
-                f"Source: {chunk.filename} (Chunk {chunk.chunk_index})\n{chunk.chunk_text}"
-                for chunk in retrieved_chunks
-            ])
-
-            # Create prompt for LLM
-            system_prompt = (
-                "You are a helpful assistant that answers questions based on the provided context. "
-                "Use only the information from the context to answer the question. "
-                "If the context doesn't contain enough information, say so. "
-                "Always cite which source document your answer comes from."
-            )
+                return self._NO_CONTEXT_ANSWER
 
-            user_prompt = f"""Context: {context}
-            Question: {query}
-            Please provide a clear and detailed answer based on the context.
-            """
-
-            client = OpenAI(api_key=settings.openai_api_key)
-
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.5,
-                max_tokens=500
+            response = await self.llm_client.chat.completions.create(
+                model=settings.OPENAI_CHAT_MODEL,
+                messages=self._build_messages(query, retrieved_chunks),
+                temperature=settings.OPENAI_CHAT_TEMPERATURE,
+                max_tokens=settings.OPENAI_CHAT_MAX_TOKENS,
+                response_format={"type": "text"}
             )
 
             answer = response.choices[0].message.content
@@ -195,11 +321,60 @@ class RAGPipeline:
             logger.error(f"Error generating answer: {e}")
             raise
 
-    def query(self, query:str, db: Session, top_k: int = None,
-              similarity_threshold: float = None) -> QueryResponse:
+    async def stream_answer(self, query: str, retrieved_chunks: List[RetrievedChunk]) -> AsyncIterator[str]:
+        """
+        Generate an answer based on retrieved chunks, yielding tokens as the LLM produces them.
+
+        Args:
+            query: User query
+            retrieved_chunks: Retrieved relevant chunks
+
+        Yields:
+            Pieces of the generated answer
+        """
+        if not retrieved_chunks:
+            yield self._NO_CONTEXT_ANSWER
+            return
+
+        stream = await self.llm_client.chat.completions.create(
+            model=settings.OPENAI_CHAT_MODEL,
+            messages=self._build_messages(query, retrieved_chunks),
+            temperature=settings.OPENAI_CHAT_TEMPERATURE,
+            max_tokens=settings.OPENAI_CHAT_MAX_TOKENS,
+            response_format={"type": "text"},
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _log_query(self, db: Session, query: str, answer: str,
+                   retrieved_chunks: List[RetrievedChunk], response_time: float) -> None:
+        """Store a query, its answer and the retrieved chunk IDs/scores in the query log."""
+        query_log = QueryLog(
+            query=query,
+            response=answer,
+            retrieved_chunks=orjson.dumps([c.chunk_id for c in retrieved_chunks]).decode(),
+            similarity_score=orjson.dumps([c.similarity_score for c in retrieved_chunks]).decode(),
+            response_time=response_time
+        )
+        db.add(query_log)
+        db.commit()
+
+    def _log_query_new_session(self, query: str, answer: str,
+                               retrieved_chunks: List[RetrievedChunk], response_time: float) -> None:
+        """Store a query log entry using a dedicated database session."""
+        with get_db_manager().get_session() as db:
+            self._log_query(db, query, answer, retrieved_chunks, response_time)
+
+    async def query(self, query:str, db: Session, top_k: int = None,
+                    similarity_threshold: float = None) -> QueryResponse:
         """
         Complete RAG pipeline: retrieve and generate answer.
 
+        Blocking steps (query embedding, database access) run in a worker thread;
+        the LLM call is awaited on the event loop.
+
         Args:
             query: User query
             db: Database session
@@ -212,22 +387,14 @@ class RAGPipeline:
         try:
             start_time = time.time()
             # Retrieve relevant chunks
-            retrieved_chunks = self.retrieval_relevant_chunks(
-                query, db, top_k, similarity_threshold
+            retrieved_chunks = await asyncio.to_thread(
+                self.retrieval_relevant_chunks, query, db, top_k, similarity_threshold
             )
 
-            answer = self.generate_answer(query, retrieved_chunks)
+            answer = await self.generate_answer(query, retrieved_chunks)
             response_time = time.time() - start_time
             # Log the query
-            query_log = QueryLog(
-                query=query,
-                response=answer,
-                retrieved_chunks=json.dumps([c.chunk_id for c in retrieved_chunks]),
-                similarity_score=json.dumps([c.similarity_score for c in retrieved_chunks]),
-                response_time=response_time
-            )
-            db.add(query_log)
-            db.commit()
+            await asyncio.to_thread(self._log_query, db, query, answer, retrieved_chunks, response_time)
             # Create response
             response = QueryResponse(
                 query=query,
@@ -242,5 +409,35 @@ class RAGPipeline:
             logger.error(f"Error in RAG query pipeline: {e}")
             raise
 
+    async def query_stream(self, query: str, retrieved_chunks: List[RetrievedChunk],
+                           start_time: float) -> AsyncIterator[str]:
+        """
+        Stream the answer for already retrieved chunks and log the query once it completes.
+
+        The request's database session is closed once the streaming response starts,
+        so the query log is written with a session of its own.
+
+        Args:
+            query: User query
+            retrieved_chunks: Chunks returned by retrieval_relevant_chunks
+            start_time: time.time() at which the request started
+
+        Yields:
+            Pieces of the generated answer
+        """
+        parts = []
+        try:
+            async for token in self.stream_answer(query, retrieved_chunks):
+                parts.append(token)
+                yield token
+        except Exception as e:
+            logger.error(f"Error streaming answer: {e}")
+            raise
+
+        response_time = time.time() - start_time
+        await asyncio.to_thread(self._log_query_new_session, query, "".join(parts),
+                                retrieved_chunks, response_time)
+        logger.info(f"Streamed query completed in {response_time:.2f} seconds")
+
 # Singleton instance of RAGPipeline. Global RAG pipeline instance.
 rag_pipeline = RAGPipeline()
\ No newline at end of file
@@ -4,6 +4,20 @@ Dependency injection for FastAPI endpoints.
 This module contains common dependencies used across routers.
 """
 
+from functools import lru_cache
+
+from apps.api.config import get_settings
 from apps.api.core.database import get_db
 
-__all__ = ["get_db"]
\ No newline at end of file
+__all__ = ["get_db", "get_rag_pipeline", "get_settings"]
+
+@lru_cache(maxsize=1)
+def get_rag_pipeline():
+    """
+    Get the app-wide RAGPipeline instance, importing it on first use.
+
+    The pipeline pulls in the document loaders, the embedding service and the
+    OpenAI clients; deferring the import keeps startup, /health and scripts light.
+    """
+    from apps.api.core.rag_pipeline import rag_pipeline
+    return rag_pipeline
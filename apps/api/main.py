@@ -1,12 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 import logging
 import sys
 
 from apps.api.config import settings
 from apps.api.routers import documents, query, health
-from apps.api.core.database import db_manager
+from apps.api.core.database import get_db_manager, get_chroma_manager
 
 # Configure logging
 logging.basicConfig(
@@ -24,11 +26,21 @@ async def lifespan(_app: FastAPI):
     logger.info(f"Starting {settings.app_name} v{settings.app_version}...")
     logger.info(f"Environment: {settings.environment}")
 
+    db_manager = get_db_manager()
+
     # Check database connection
-    if db_manager.check_connection():
+    if db_manager.check_connection(force=True):
         logger.info("Database connection established")
+        warmed = db_manager.warm_pool(settings.db_pool_warm)
+        logger.info(f"Database pool warmed with {warmed} connections")
     else:
         logger.error("Database connection failed")
+
+    # Open ChromaDB and its collections now instead of on the first request
+    try:
+        get_chroma_manager().create_collections()
+    except Exception as e:
+        logger.error(f"ChromaDB initialization failed: {e}")
     yield
 
     logger.info("Shutting down application...")
@@ -40,7 +52,8 @@ app = FastAPI(
     description="AI-driven agent for personalized student support in Optimization Methods course",
     version=settings.app_version,
     debug=settings.debug,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse # orjson serializes large chunk payloads much faster
 )
 
 # Configure cors
@@ -53,6 +66,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses; retrieved chunk text in query results compresses well
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Include routers
 app.include_router(documents.router) # Likely handles CRUD operations for documents
 app.include_router(query.router) # Probably processes user queries
@@ -77,4 +93,9 @@ if __name__ == "__main__":
         host=settings.api_host,
         port=settings.api_port,
         reload=settings.debug,
+        workers=None if settings.debug else settings.api_workers, # reload runs a single process
+        loop=settings.api_loop,
+        http=settings.api_http,
+        backlog=settings.api_backlog,
+        limit_concurrency=settings.api_limit_concurrency,
     )
\ No newline at end of file
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, func
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Index, ForeignKey, func
+from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.dialects.postgresql import JSONB
+from pgvector.sqlalchemy import HALFVEC
 
 from datetime import datetime
 from typing import Optional, Dict, Any, List
@@ -9,32 +11,57 @@ from pydantic import BaseModel, Field
 # This creates a base class (Base) that all subsequent model classes will inherit from.
 Base = declarative_base()
 
+# Document ingestion states
+DOCUMENT_STATUS_PROCESSING = "processing"
+DOCUMENT_STATUS_READY = "ready"
+DOCUMENT_STATUS_FAILED = "failed"
+
 class Document(Base):
     """Database model for storing documents and their metadata."""
     __tablename__ = "documents"
+    __table_args__ = (
+        # Covering index so the retrieval JOIN reads filenames with an index-only scan
+        Index("documents_id_filename_idx", "id", postgresql_include=["filename"]),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(255), nullable=False)
     file_path = Column(String(512), nullable=False)
     file_type = Column(String(50), nullable=False) # pdf, txt, etc.
     content = Column(Text, nullable=False)
-    extra_metadata = Column(Text, nullable=True) # JSON string for additional metadata
+    extra_metadata = Column(JSONB, nullable=True) # Additional metadata
+    centroid = Column(HALFVEC(1536), nullable=True) # Unit-length mean of the chunk embeddings
+    status = Column(String(20), nullable=False, default=DOCUMENT_STATUS_READY,
+                    server_default=DOCUMENT_STATUS_READY) # processing, ready or failed
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Chunks are removed by the ON DELETE CASCADE foreign key, without loading them first
+    chunks = relationship("DocumentChunk", cascade="all, delete-orphan", passive_deletes=True)
+
     def __repr__(self):
         return f"<Document(id={self.id}, filename='{self.filename}')>"
 
 class DocumentChunk(Base):
 
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        # HNSW index for approximate nearest-neighbour retrieval by inner product (<#>)
+        Index(
+            "document_chunks_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "halfvec_ip_ops"},
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, nullable=False, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
     chunk_text = Column(Text, nullable=False)
     chunk_index = Column(Integer, nullable=False) # Order of the chunk in the document
-    embedding = Column(Vector(1536), nullable=False) # OpenAI embedding dimension
-    extra_metadata = Column(Text, nullable=True) # JSON string for chunk-specific metadata
+    embedding = Column(HALFVEC(1536), nullable=False) # OpenAI embedding dimension, stored as FP16
+    extra_metadata = Column(JSONB, nullable=True) # Chunk-specific metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     def __repr__(self):
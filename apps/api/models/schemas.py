@@ -7,6 +7,7 @@ class DocumentUploadResponse(BaseModel):
     document_id: int
     filename: str
     chunk_created: int
+    status: str
     message: str
 
 class DocumentInfo(BaseModel):
@@ -15,6 +16,7 @@ class DocumentInfo(BaseModel):
     filename: str
     file_type: str
     created_at: datetime
+    status: str
     chunk_count: Optional[int] = None
 
     class Config:
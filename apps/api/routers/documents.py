@@ -1,80 +1,244 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-import shutil
+from sqlalchemy import delete, func, select
+from typing import BinaryIO, List, Optional, Union
 from pathlib import Path
+import errno
+import hashlib
+import io
 import logging
+import os
 
-from apps.api.core.rag_pipeline import rag_pipeline
 from apps.api.models.schemas import DocumentUploadResponse, DocumentInfo
-from apps.api.models.db_models import Document, DocumentChunk
+from apps.api.models.db_models import (Document, DocumentChunk, DOCUMENT_STATUS_PROCESSING,
+                                       DOCUMENT_STATUS_FAILED)
 from apps.api.core.database import get_db
+from apps.api.deps import get_rag_pipeline
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 logger = logging.getLogger(__name__)
 
-ALLOWED_EXTENSIONS = {"txt", "pdf"}
+ALLOWED_EXTENSIONS = ("pdf", "txt")
+_ALLOWED_SUFFIXES = tuple(f".{ext}" for ext in ALLOWED_EXTENSIONS) # for str.endswith
 MAX_FILE_SIZE = 10 * 1024 * 1024 # 10 MB
+LIST_DOCUMENTS_MAX_AGE = 5 # seconds clients may reuse the document list
+UPLOAD_CHUNK_SIZE = 1024 * 1024 # 1 MiB buffer when uploads are copied in user space
+# errno values meaning a kernel copy call is not supported for these descriptors
+_KERNEL_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP}
 
-@router.post("/upload", response_model=DocumentUploadResponse, status_code=status.HTTP_201_CREATED)
+# Documents with chunk counts, built once at import
+_LIST_DOCUMENTS_STMT = select(
+    Document.id,
+    Document.filename,
+    Document.file_type,
+    Document.created_at,
+    Document.status,
+    func.count(DocumentChunk.id).label("chunk_count")
+).select_from(Document).outerjoin(
+    DocumentChunk, Document.id == DocumentChunk.document_id
+).group_by(Document.id)
+
+# Version of the document list, built only from values that change with it:
+# inserts move max(id), deletes the count, ingestion the status counts. Chunk rows
+# only change alongside those, so the chunks table is not scanned on every poll.
+# (Timestamps would not do: now() is the transaction start, so a long ingest can
+# commit an updated_at older than the current maximum.)
+_DOCUMENTS_VERSION_STMT = select(
+    func.count(Document.id),
+    func.max(Document.id),
+    func.count(Document.id).filter(Document.status == DOCUMENT_STATUS_PROCESSING),
+    func.count(Document.id).filter(Document.status == DOCUMENT_STATUS_FAILED)
+)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weakly compare an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag.removeprefix("W/")
+               for tag in if_none_match.split(","))
+
+def _check_file_size(file_size: int) -> None:
+    """Raise an HTTP 413 error if an upload exceeds MAX_FILE_SIZE."""
+    if file_size > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File size {file_size} exceeds maximum. Max size: {MAX_FILE_SIZE / 1024 / 1024} MB"
+        )
+
+def _upload_fileno(src: BinaryIO) -> Optional[int]:
+    """
+    Return the OS file descriptor behind an upload, if it has one.
+
+    Starlette spools uploads in a SpooledTemporaryFile that stays in memory until it
+    rolls over to disk. fileno() would force that rollover, so in-memory spools are skipped.
+    """
+    if not getattr(src, "_rolled", True):
+        return None
+    try:
+        return src.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+def _advise_sequential(fd: int) -> None:
+    """Tell the kernel a file is accessed front to back, so it reads ahead (where supported)."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass # Only a hint
+
+def _kernel_copy(in_fd: int, out_fd: int, size: int) -> int:
+    """
+    Copy bytes between file descriptors without passing them through user space.
+
+    Uses copy_file_range, falling back to sendfile where it is unsupported
+    (e.g. across filesystems). Writes advance out_fd's position, so a caller can
+    continue with a regular copy from the returned offset.
+
+    Args:
+        in_fd: Source file descriptor
+        out_fd: Destination file descriptor
+        size: Number of bytes to copy
+
+    Returns:
+        Number of bytes copied before finishing or hitting an unsupported call
+    """
+    offset = 0
+    use_copy_file_range = hasattr(os, "copy_file_range")
+    use_sendfile = hasattr(os, "sendfile")
+    while offset < size:
+        try:
+            if use_copy_file_range:
+                copied = os.copy_file_range(in_fd, out_fd, size - offset, offset)
+            elif use_sendfile:
+                copied = os.sendfile(out_fd, in_fd, offset, size - offset)
+            else:
+                break
+        except OSError as e:
+            if e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                raise
+            if use_copy_file_range:
+                use_copy_file_range = False
+            else:
+                use_sendfile = False
+            continue
+        if copied == 0:
+            break
+        offset += copied
+    return offset
+
+def _save_upload(src: BinaryIO, file_path: Path) -> int:
+    """
+    Write an uploaded file to disk.
+
+    Uploads that rolled over to a temporary file are copied inside the kernel;
+    in-memory uploads (and anything the kernel copy leaves) go through a 1 MiB buffer.
+    Peak memory is one buffer, and oversized uploads are rejected with HTTP 413 as
+    soon as the limit is passed.
+
+    Args:
+        src: The upload's underlying file object
+        file_path: Destination path
+
+    Returns:
+        Number of bytes written
+    """
+    in_fd = _upload_fileno(src)
+    if in_fd is not None:
+        # Reject oversized files before copying anything
+        _check_file_size(os.fstat(in_fd).st_size)
+
+    out_fd = os.open(str(file_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    # No DONTNEED on the destination: background ingestion reads it right back
+    _advise_sequential(out_fd)
+    if in_fd is not None:
+        _advise_sequential(in_fd)
+    try:
+        offset = 0
+        if in_fd is not None:
+            offset = _kernel_copy(in_fd, out_fd, os.fstat(in_fd).st_size)
+        # Copy the rest through one reused buffer, aborting as soon as the limit is passed
+        src.seek(offset)
+        file_size = offset
+        chunk = memoryview(bytearray(UPLOAD_CHUNK_SIZE))
+        # SpooledTemporaryFile has readinto() only from Python 3.11; before that, use the file it wraps
+        readinto = getattr(src, "readinto", None) or src._file.readinto
+        with open(out_fd, "wb", closefd=False) as buffer:
+            while read := readinto(chunk):
+                file_size += read
+                _check_file_size(file_size)
+                buffer.write(chunk[:read])
+    finally:
+        os.close(out_fd)
+
+    return file_size
+
+@router.post("/upload", response_model=DocumentUploadResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload_document(
+        background_tasks: BackgroundTasks,
         file: UploadFile = File(...),
-        db: Session = Depends(get_db)
+        db: Session = Depends(get_db),
+        pipeline=Depends(get_rag_pipeline)
 ) -> DocumentUploadResponse:
     """
-    Upload and process a document.
+    Upload a document and queue it for processing.
+
+    The file is saved and its record created before responding; chunking and
+    embedding run as a background task, and the document's status moves from
+    "processing" to "ready" (or "failed").
 
     Args:
+        background_tasks: Tasks run after the response is sent
         file: The document file to upload
         db: Database session
+        pipeline: RAG pipeline
 
     Returns:
         DocumentUploadResponse with upload details
     """
     try:
         # Validate file extension
-        file_extension = Path(file.filename).suffix.lower()
-        if file_extension not in ALLOWED_EXTENSIONS:
+        filename_lower = file.filename.lower()
+        if not filename_lower.endswith(_ALLOWED_SUFFIXES):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File extension '{file_extension}' not supported. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
-            )
-
-        # Check file size
-        file.file.seek(0, 2) # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0) # Reset to beginning
-
-        if file_size > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File size {file_size} exceeds maximum. Max size: {MAX_FILE_SIZE / 1024 / 1024} MB"
+                detail=f"File type of '{file.filename}' not supported. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
             )
+        file_type = filename_lower.rsplit(".", 1)[-1]
 
         # Create the data directory if it doesn't exist
         data_dir = Path("data/raw")
         data_dir.mkdir(parents=True, exist_ok=True)
 
-        # Save the file
+        # Save the file off the event loop, rejecting it if it is too large
         file_path = data_dir / file.filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        try:
+            await run_in_threadpool(_save_upload, file.file, file_path)
+        except BaseException:
+            # Don't leave a partial file behind (size limit, I/O error or client disconnect)
+            file_path.unlink(missing_ok=True)
+            raise
 
-        logger.info(f"File saved to {file_path}")
+        logger.info("File saved to %s", file_path)
 
-        document_id, chunks_created = rag_pipeline.ingest_document(
-            file_path=str(file_path),
-            filename=file.filename,
-            file_type=file_extension[1:], # remove the dot
-            db=db
+        document_id = await run_in_threadpool(
+            pipeline.create_document,
+            str(file_path),
+            file.filename,
+            file_type,
+            db
         )
+        background_tasks.add_task(pipeline.ingest_document_in_background, document_id)
 
         return DocumentUploadResponse(
             document_id=document_id,
             filename=file.filename,
-            chunk_created=chunks_created,
-            message=f"Document uploaded and processed successfully."
+            chunk_created=0,
+            status=DOCUMENT_STATUS_PROCESSING,
+            message="Document uploaded successfully and is being processed."
         )
     except HTTPException:
         raise
@@ -86,36 +250,36 @@ async def upload_document(
         )
 
 @router.get("/", response_model=List[DocumentInfo])
-def list_documents(db: Session = Depends(get_db)) -> List[DocumentInfo]:
+def list_documents(request: Request, response: Response,
+                   db: Session = Depends(get_db)) -> Union[List[DocumentInfo], Response]:
     """
     List all documents in the knowledge base.
 
+    The response carries an ETag built from a cheap aggregate over the documents
+    table; a matching If-None-Match gets a 304 without running the full listing.
+
     Args:
+        request: Incoming request (for If-None-Match)
+        response: Response whose caching headers are set
         db: Database session
 
     Returns:
-        List of DocumentInfo objects
+        List of DocumentInfo objects, or an empty 304 response
     """
     try:
-        # Query documents with chunk counts
-        documents = db.query(
-            Document,
-            func.count(DocumentChunk.id).label("chunk_count")
-        ).outerjoin(
-            DocumentChunk, Document.id == DocumentChunk.document_id
-        ).group_by(Document.id).all()
-        # Format response
-        document_list = []
-        for doc, chunk_count in documents:
-            doc_info = DocumentInfo(
-                id=doc.id,
-                filename=doc.filename,
-                file_type=doc.file_type,
-                created_at=doc.created_at,
-                chunk_count=chunk_count
-            )
-            document_list.append(doc_info)
-        return document_list
+        version_row = db.execute(_DOCUMENTS_VERSION_STMT).one()
+        version = ":".join(str(value) for value in version_row).encode("utf-8")
+        headers = {
+            "ETag": f'W/"{hashlib.blake2b(version, digest_size=16).hexdigest()}"',
+            "Cache-Control": f"max-age={LIST_DOCUMENTS_MAX_AGE}",
+        }
+        if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+
+        # Select only the columns DocumentInfo needs, so no Document objects are hydrated
+        result = db.execute(_LIST_DOCUMENTS_STMT)
+        return [DocumentInfo(**row._mapping) for row in result]
     except Exception as e:
         logger.error(f"Error listing documents: {e}")
         raise HTTPException(
@@ -136,28 +300,28 @@ def get_document(document_id: int, db: Session = Depends(get_db)) -> DocumentInf
         DocumentInfo object
     """
     try:
-        result = db.query(
-            Document,
-            func.count(DocumentChunk.id).label("chunk_count")
-        ).outerjoin(
-            DocumentChunk, Document.id == DocumentChunk.document_id
-        ).filter(Document.id == document_id).group_by(Document.id).first()
-
-        if not result:
+        # One row, with the chunk count from an index lookup instead of a GROUP BY
+        chunk_count = select(func.count(DocumentChunk.id)).where(
+            DocumentChunk.document_id == document_id
+        ).scalar_subquery()
+        row = db.execute(
+            select(
+                Document.id,
+                Document.filename,
+                Document.file_type,
+                Document.created_at,
+                Document.status,
+                chunk_count.label("chunk_count")
+            ).where(Document.id == document_id)
+        ).first()
+
+        if not row:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Document with ID {document_id} not found."
             )
 
-        doc, chunk_count = result
-
-        return DocumentInfo(
-            id=doc.id,
-            filename=doc.filename,
-            file_type=doc.file_type,
-            created_at=doc.created_at,
-            chunk_count=chunk_count
-        )
+        return DocumentInfo(**row._mapping)
     except HTTPException:
         raise
     except Exception as e:
@@ -177,25 +341,18 @@ def delete_document(document_id: int, db: Session = Depends(get_db)):
         db: Database session
     """
     try:
-        # Find document
-        document = db.query(Document).filter(Document.id == document_id).first()
-        if not document:
+        # One DELETE; chunks go with it via ON DELETE CASCADE
+        file_path = db.execute(
+            delete(Document).where(Document.id == document_id).returning(Document.file_path)
+        ).scalar_one_or_none()
+        if file_path is None:
             raise HTTPException(
-                status_code=status.HTTP_400_NOT_FOUND,
+                status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Document with ID {document_id} not found."
             )
-        # Delete associated chunks
-        db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete()
-
-        # Delete the file from the filesystem
-        file_path = Path(document.file_path)
-        if file_path.exists():
-            file_path.unlink()
-        # Delete document record
-        db.delete(document)
         db.commit()
 
-        logger.info(f"Document {document_id} deleted successfully.")
+        logger.info("Document %s deleted successfully.", document_id)
 
     except HTTPException:
         raise
@@ -206,3 +363,10 @@ def delete_document(document_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error deleting document: {str(e)}"
         )
+
+    # Remove the file only once the database delete is committed; the database stays
+    # the source of truth if the filesystem call fails
+    try:
+        Path(file_path).unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning(f"Could not remove file {file_path} of deleted document {document_id}: {e}")
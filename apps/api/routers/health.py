@@ -1,32 +1,31 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from datetime import datetime
+from datetime import datetime, timezone
 
 from apps.api.models.schemas import HealthResponse
-from apps.api.core.database import get_db
-from apps.api.config import settings
+from apps.api.core.database import get_db_manager
+from apps.api.config import Settings, get_settings
 
 router = APIRouter(prefix="/health", tags=["health"])
 
+_UTC = timezone.utc
+
 @router.get("/", response_model=HealthResponse)
-def health_check(db: Session = Depends(get_db)) -> HealthResponse:
+def health_check(settings: Settings = Depends(get_settings)) -> HealthResponse:
     """
     Health check endpoint to verify service status.
 
+    The database probe is cached for `settings.health_check_ttl` seconds, so frequent
+    polling doesn't take a pooled connection on every hit.
+
     Returns:
         HealthResponse with system status
     """
-    try:
-        db.execute(text("SELECT 1"))
-        db_connected = True
-    except Exception:
-        db_connected = False
+    db_connected = get_db_manager().check_connection()
 
     return HealthResponse(
         status="healthy" if db_connected else "unhealthy",
         app_name=settings.app_name,
         version=settings.app_version,
         database_connected=db_connected,
-        timestamp=datetime.now()
+        timestamp=datetime.now(_UTC)
     )
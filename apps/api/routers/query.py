@@ -1,30 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+import asyncio
 import logging
+import time
 
 from apps.api.models.schemas import QueryRequest, QueryResponse
 from apps.api.core.database import get_db
-from apps.api.core.rag_pipeline import rag_pipeline
+from apps.api.deps import get_rag_pipeline
 
 router = APIRouter(prefix="/query", tags=["query"])
 logger = logging.getLogger(__name__)
 
 @router.post("/", response_model=QueryResponse)
-def query_knowledge_base(request: QueryRequest, db: Session = Depends(get_db)) -> QueryResponse:
+async def query_knowledge_base(request: QueryRequest, db: Session = Depends(get_db),
+                               pipeline=Depends(get_rag_pipeline)) -> QueryResponse:
     """
     Query the knowledge base using RAG.
 
     Args:
         request: Query request with query text and optional parameters
         db: Database session
+        pipeline: RAG pipeline
 
     Returns:
         QueryResponse with answer and retrieved chunks
     """
     try:
-        logger.info(f"Processing query: {request.query[:50]}...")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Processing query: %s...", request.query[:50])
 
-        response = rag_pipeline.query(
+        response = await pipeline.query(
             query=request.query,
             db=db,
             top_k=request.top_k,
@@ -35,4 +41,40 @@ def query_knowledge_base(request: QueryRequest, db: Session = Depends(get_db)) -
         logger.error(f"Error processing query: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Error processing query: {str(e)}"
-                            )
\ No newline at end of file
+                            )
+
+@router.post("/stream")
+async def query_knowledge_base_stream(request: QueryRequest, db: Session = Depends(get_db),
+                                      pipeline=Depends(get_rag_pipeline)) -> StreamingResponse:
+    """
+    Query the knowledge base using RAG, streaming the answer as plain text while it is generated.
+
+    Retrieval runs before the response starts, so retrieval errors still return a 500.
+
+    Args:
+        request: Query request with query text and optional parameters
+        db: Database session
+        pipeline: RAG pipeline
+
+    Returns:
+        StreamingResponse with the answer tokens
+    """
+    try:
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Processing streamed query: %s...", request.query[:50])
+
+        start_time = time.time()
+        retrieved_chunks = await asyncio.to_thread(
+            pipeline.retrieval_relevant_chunks,
+            request.query, db, request.top_k, request.similarity_threshold
+        )
+    except Exception as e:
+        logger.error(f"Error processing query: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail=f"Error processing query: {str(e)}"
+                            )
+
+    return StreamingResponse(
+        pipeline.query_stream(request.query, retrieved_chunks, start_time),
+        media_type="text/plain; charset=utf-8"
+    )
@@ -1,8 +1,13 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 
+from multipart_body import MultipartFileBody # streamlit puts this script's directory on sys.path
+
 API_BASE_URL = "http://localhost:8000"
+REQUEST_TIMEOUT = 120 # seconds; bounds the LLM round trip of a query
 
 st.set_page_config(
     page_title="RAG Knowledge Base - Testing Interface",
@@ -10,36 +15,50 @@ st.set_page_config(
     layout="wide"
 )
 
-def upload_document(file) -> Dict:
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Shared HTTP session, so every action reuses pooled keep-alive connections to the API."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def upload_document(session: requests.Session, file) -> Dict:
     """Upload a document to the API."""
-    files = {"file": (file.name, file, file.type)}
-    response = requests.post(f"{API_BASE_URL}/documents/upload", files=files)
+    body = MultipartFileBody("file", file.name, file, file.type)
+    response = session.post(
+        f"{API_BASE_URL}/documents/upload",
+        data=body,
+        headers={"Content-Type": body.content_type},
+        timeout=REQUEST_TIMEOUT
+    )
     return response.json()
 
-def get_documents() -> List[Dict]:
+def get_documents(session: requests.Session) -> List[Dict]:
     """Get the list of all documents."""
-    response = requests.get(f"{API_BASE_URL}/documents")
+    response = session.get(f"{API_BASE_URL}/documents/", timeout=REQUEST_TIMEOUT)
     return response.json()
 
-def delete_document(document_id: int):
+def delete_document(session: requests.Session, document_id: int):
     """Delete a document."""
-    response = requests.delete(f"{API_BASE_URL}/documents/{document_id}")
+    response = session.delete(f"{API_BASE_URL}/documents/{document_id}", timeout=REQUEST_TIMEOUT)
     return response.status_code == 204
 
-def query_knowledge_base(query: str, top_k: int = 5, threshold: float = 0.7) -> Dict:
+def query_knowledge_base(session: requests.Session, query: str, top_k: int = 5, threshold: float = 0.7) -> Dict:
     """Query the knowledge base."""
     payload = {
         "query": query,
         "top_k": top_k,
         "similarity_threshold": threshold
     }
-    response = requests.post(f"{API_BASE_URL}/rag/query", json=payload)
+    response = session.post(f"{API_BASE_URL}/query/", json=payload, timeout=REQUEST_TIMEOUT)
     return response.json()
 
-def check_health() -> Dict:
+def check_health(session: requests.Session) -> Dict:
     """Check the health of the API."""
     try:
-        response = requests.get(f"{API_BASE_URL}/health")
+        response = session.get(f"{API_BASE_URL}/health/", timeout=REQUEST_TIMEOUT)
         return response.json()
     except:
         return {"status": "unavailable"}
@@ -47,9 +66,16 @@ def check_health() -> Dict:
 # Main UI
 st.title("📚 RAG Knowledge Base - Testing Interface")
 
+# Fetch the API status and the document list concurrently, before rendering
+# The cached session is fetched on the script thread and handed to the workers
+session = get_session()
+with ThreadPoolExecutor(max_workers=2) as executor:
+    health_future = executor.submit(check_health, session)
+    documents_future = executor.submit(get_documents, session)
+
 with st.sidebar:
     st.header("System Status")
-    health = check_health()
+    health = health_future.result()
 
     if health.get("status") == "healthy":
         st.success("✅ API is running")
@@ -82,7 +108,7 @@ with tab1:
         if query_input:
             with st.spinner("Searching knowledge base..."):
                 try:
-                    result = query_knowledge_base(query_input, top_k, threshold)
+                    result = query_knowledge_base(session, query_input, top_k, threshold)
 
                     # Display answer
                     st.subheader("Answer")
@@ -120,7 +146,7 @@ with tab2:
         st.rerun()
 
     try:
-        documents = get_documents()
+        documents = documents_future.result()
 
         if documents:
             st.write(f"Total documents: {len(documents)}")
@@ -132,10 +158,10 @@ with tab2:
                 with col2:
                     st.write(f"Type: {doc['file_type']}")
                 with col3:
-                    st.write(f"Chunks: {doc.get('chunk_count', 0)}")
+                    st.write(f"Chunks: {doc.get('chunk_count', 0)} ({doc.get('status', 'ready')})")
                 with col4:
                     if st.button("🗑️", key=f"delete_{doc['id']}"):
-                        if delete_document(doc['id']):
+                        if delete_document(session, doc['id']):
                             st.success("Document deleted successfully.")
                             st.rerun()
                         else:
@@ -161,16 +187,16 @@ with tab3:
         st.info(f"File: {uploaded_file.name} ({uploaded_file.size} bytes)")
 
         if st.button("Upload", type="primary", use_container_width=True):
-            with st.spinner("Uploading and processing document..."):
+            with st.spinner("Uploading document..."):
                 try:
-                    result = upload_document(uploaded_file)
+                    result = upload_document(session, uploaded_file)
                     st.success("✅ Document uploaded successfully!")
 
                     col1, col2 = st.columns(2)
                     with col1:
                         st.metric("Document ID", result["document_id"])
                     with col2:
-                        st.metric("Chunks Created", result["chunks_created"])
+                        st.metric("Status", result["status"])
 
                     st.info(result["message"])
                 except Exception as e:
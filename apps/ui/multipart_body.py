@@ -0,0 +1,42 @@
+from typing import BinaryIO, Optional
+import io
+import uuid
+
+class MultipartFileBody:
+    """
+    multipart/form-data body for a single file, read lazily from the file object.
+
+    requests builds `files=` bodies fully in memory; this file-like object has a known
+    length, so requests sends it with a Content-Length and streams it in blocks.
+    """
+    def __init__(self, field: str, filename: str, fileobj: BinaryIO, content_type: Optional[str] = None):
+        boundary = uuid.uuid4().hex
+        filename = filename.replace('"', "%22")
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type or 'application/octet-stream'}\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+        fileobj.seek(0, io.SEEK_END)
+        file_size = fileobj.tell()
+        fileobj.seek(0)
+
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self._parts = [io.BytesIO(head), fileobj, io.BytesIO(tail)]
+        self._length = len(head) + file_size + len(tail)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to `size` bytes of the body (everything left if size is negative)."""
+        out = bytearray()
+        while self._parts and (size < 0 or len(out) < size):
+            data = self._parts[0].read(-1 if size < 0 else size - len(out))
+            if data:
+                out += data
+            else:
+                self._parts.pop(0)
+        return bytes(out)
@@ -9,7 +9,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from apps.api.core.database import db_manager
+from apps.api.core.database import get_db_manager
 import logging
 
 logging.basicConfig(
@@ -23,8 +23,9 @@ def main():
     """Initialize database."""
     try:
         logger.info("Initializing database...")
+        db_manager = get_db_manager()
         # Check database connection
-        if not db_manager.check_connection():
+        if not db_manager.check_connection(force=True):
             logger.error("Cannot connect to database. Please check your configuration.")
             return False
 
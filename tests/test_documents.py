@@ -0,0 +1,130 @@
+import errno
+import io
+import os
+import tempfile
+
+import pytest
+from fastapi import HTTPException
+
+from apps.api.routers import documents
+from apps.api.routers.documents import _etag_matches, _kernel_copy, _save_upload
+
+
+def _spool(data: bytes, rolled: bool) -> tempfile.SpooledTemporaryFile:
+    src = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    src.write(data)
+    if rolled:
+        src.rollover()
+    src.seek(0)
+    return src
+
+
+def _unsupported(*args):
+    raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+
+@pytest.fixture
+def payload() -> bytes:
+    return os.urandom(300_000)
+
+
+@pytest.mark.parametrize("rolled", [False, True])
+def test_save_upload_writes_spooled_file(tmp_path, payload, rolled):
+    target = tmp_path / "upload.bin"
+    with _spool(payload, rolled) as src:
+        assert _save_upload(src, target) == len(payload)
+    assert target.read_bytes() == payload
+
+
+def test_save_upload_without_spool_readinto(tmp_path, payload):
+    class LegacySpool: # SpooledTemporaryFile before Python 3.11: no readinto()
+        _rolled = False
+
+        def __init__(self, data: bytes):
+            self._file = io.BytesIO(data)
+
+        def seek(self, offset: int) -> int:
+            return self._file.seek(offset)
+
+    target = tmp_path / "upload.bin"
+    assert _save_upload(LegacySpool(payload), target) == len(payload)
+    assert target.read_bytes() == payload
+
+def test_save_upload_in_memory_spool_is_not_rolled_over(tmp_path, payload, monkeypatch):
+    monkeypatch.setattr(documents, "_kernel_copy", pytest.fail)
+    with _spool(payload, rolled=False) as src:
+        _save_upload(src, tmp_path / "upload.bin")
+        assert not src._rolled
+
+
+def test_save_upload_falls_back_to_buffered_copy(tmp_path, payload, monkeypatch):
+    monkeypatch.setattr(documents, "UPLOAD_CHUNK_SIZE", 4096)
+    monkeypatch.setattr(os, "copy_file_range", _unsupported, raising=False)
+    monkeypatch.setattr(os, "sendfile", _unsupported, raising=False)
+    target = tmp_path / "upload.bin"
+    with _spool(payload, rolled=True) as src:
+        assert _save_upload(src, target) == len(payload)
+    assert target.read_bytes() == payload
+
+
+@pytest.mark.parametrize("rolled", [False, True])
+def test_save_upload_rejects_oversized_file(tmp_path, payload, monkeypatch, rolled):
+    monkeypatch.setattr(documents, "MAX_FILE_SIZE", len(payload) - 1)
+    monkeypatch.setattr(documents, "UPLOAD_CHUNK_SIZE", 4096)
+    with _spool(payload, rolled) as src, pytest.raises(HTTPException) as exc_info:
+        _save_upload(src, tmp_path / "upload.bin")
+    assert exc_info.value.status_code == 413
+
+
+@pytest.mark.skipif(not hasattr(os, "sendfile"), reason="os.sendfile is not available")
+def test_kernel_copy_falls_back_to_sendfile(tmp_path, payload, monkeypatch):
+    monkeypatch.setattr(os, "copy_file_range", _unsupported, raising=False)
+    source = tmp_path / "source.bin"
+    source.write_bytes(payload)
+    target = tmp_path / "target.bin"
+    in_fd = os.open(source, os.O_RDONLY)
+    out_fd = os.open(target, os.O_WRONLY | os.O_CREAT)
+    try:
+        assert _kernel_copy(in_fd, out_fd, len(payload)) == len(payload)
+    finally:
+        os.close(in_fd)
+        os.close(out_fd)
+    assert target.read_bytes() == payload
+
+
+def test_kernel_copy_returns_zero_when_unsupported(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "copy_file_range", _unsupported, raising=False)
+    monkeypatch.setattr(os, "sendfile", _unsupported, raising=False)
+    source = tmp_path / "source.bin"
+    source.write_bytes(b"data")
+    in_fd = os.open(source, os.O_RDONLY)
+    out_fd = os.open(tmp_path / "target.bin", os.O_WRONLY | os.O_CREAT)
+    try:
+        assert _kernel_copy(in_fd, out_fd, 4) == 0
+    finally:
+        os.close(in_fd)
+        os.close(out_fd)
+
+
+def test_kernel_copy_propagates_other_errors(monkeypatch):
+    def fail(*args):
+        raise OSError(errno.EIO, os.strerror(errno.EIO))
+
+    monkeypatch.setattr(os, "copy_file_range", fail, raising=False)
+    with pytest.raises(OSError) as exc_info:
+        _kernel_copy(0, 1, 4)
+    assert exc_info.value.errno == errno.EIO
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    ('W/"abc"', True),
+    ('"abc"', True),
+    ('"other"', False),
+    ('"other", W/"abc"', True),
+    ('"other",  "another"', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert _etag_matches(if_none_match, 'W/"abc"') is expected
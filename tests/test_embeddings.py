@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from apps.api.core.embedding_cache import EmbeddingCache
+from apps.api.core.embeddings import EmbeddingService
+
+DIMENSION = 4
+
+
+class FakeEmbeddingsAPI:
+    """Stand-in for client.embeddings that records requests and returns reversed data."""
+
+    def __init__(self):
+        self.requests = []
+
+    def create(self, input, model):
+        texts = [input] if isinstance(input, str) else list(input)
+        self.requests.append(texts)
+        data = [SimpleNamespace(index=idx, embedding=_vector(text)) for idx, text in enumerate(texts)]
+        return SimpleNamespace(data=data[::-1]) # the API does not promise input order
+
+
+def _vector(text: str) -> list:
+    return [float(len(text)), float(ord(text[0])), float(ord(text[-1])), 1.0]
+
+
+@pytest.fixture
+def service():
+    service = EmbeddingService()
+    service.client = SimpleNamespace(embeddings=FakeEmbeddingsAPI())
+    service.dimension = DIMENSION
+    service.cache = None
+    return service
+
+
+def test_batch_sends_each_text_once(service):
+    texts = ["alpha", "beta", "alpha\n", "gamma", "beta"]
+    embeddings = service.generate_embedding_batch(texts, batch_size=2)
+
+    sent = [text for request in service.client.embeddings.requests for text in request]
+    assert sorted(sent) == ["alpha", "beta", "gamma"]
+    assert len(embeddings) == len(texts)
+    for text, row in zip(texts, embeddings):
+        np.testing.assert_array_equal(row, _vector(text.strip()))
+
+
+def test_batch_returns_zero_rows_for_empty_texts(service):
+    embeddings = service.generate_embedding_batch(["", "alpha", " \n "])
+
+    assert service.client.embeddings.requests == [["alpha"]]
+    np.testing.assert_array_equal(embeddings[0], np.zeros(DIMENSION))
+    np.testing.assert_array_equal(embeddings[1], _vector("alpha"))
+    np.testing.assert_array_equal(embeddings[2], np.zeros(DIMENSION))
+
+
+def test_batch_of_only_empty_texts_makes_no_request(service):
+    embeddings = service.generate_embedding_batch(["", "\n"])
+
+    assert service.client.embeddings.requests == []
+    np.testing.assert_array_equal(embeddings, np.zeros((2, DIMENSION)))
+
+
+def test_batch_reuses_cached_embeddings(service, tmp_path):
+    service.cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    service.generate_embedding_batch(["alpha", "beta"])
+    service.client.embeddings.requests.clear()
+
+    texts = ["gamma", "beta", "alpha", "gamma"]
+    embeddings = service.generate_embedding_batch(texts)
+
+    assert service.client.embeddings.requests == [["gamma"]]
+    for text, row in zip(texts, embeddings):
+        np.testing.assert_array_equal(row, _vector(text))
@@ -0,0 +1,52 @@
+import io
+from email.parser import BytesParser
+from email.policy import HTTP
+
+import pytest
+
+from apps.ui.multipart_body import MultipartFileBody
+
+
+def _parse(body: MultipartFileBody, data: bytes):
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {body.content_type}\r\n\r\n".encode("utf-8") + data
+    )
+    return list(message.iter_parts())
+
+
+def test_body_contains_file_part():
+    payload = bytes(range(256)) * 100
+    body = MultipartFileBody("file", "notes.pdf", io.BytesIO(payload), "application/pdf")
+
+    data = body.read()
+    assert len(data) == len(body)
+
+    [part] = _parse(body, data)
+    assert part.get_param("name", header="content-disposition") == "file"
+    assert part.get_filename() == "notes.pdf"
+    assert part.get_content_type() == "application/pdf"
+    assert part.get_payload(decode=True) == payload
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_read_in_blocks_matches_single_read(size):
+    payload = b"x" * 10_000
+    data = b""
+    body = MultipartFileBody("file", "a.txt", io.BytesIO(payload))
+    while block := body.read(size):
+        assert len(block) <= size
+        data += block
+
+    assert len(data) == len(body)
+    assert _parse(body, data)[0].get_payload(decode=True) == payload
+
+
+def test_length_ignores_file_position_and_quotes_filename():
+    fileobj = io.BytesIO(b"hello")
+    fileobj.read()
+    body = MultipartFileBody("file", 'say "hi".txt', fileobj)
+
+    data = body.read()
+    assert len(data) == len(body)
+    assert b'filename="say %22hi%22.txt"' in data
+    assert _parse(body, data)[0].get_content_type() == "application/octet-stream"